@@ -1,8 +1,23 @@
+import asyncio
+import time
 import motor.motor_asyncio
+from pymongo import ReadPreference
+from pymongo.write_concern import WriteConcern
 from config.settings import settings
 import logging
 
-client = motor.motor_asyncio.AsyncIOMotorClient(settings.mongodb_url)
+logger = logging.getLogger(__name__)
+
+# Pool is per worker: keep mongo_max_pool_size * WEB_CONCURRENCY below the cluster connection limit
+client = motor.motor_asyncio.AsyncIOMotorClient(
+    settings.mongodb_url,
+    maxPoolSize=settings.mongo_max_pool_size,
+    minPoolSize=settings.mongo_min_pool_size,
+    maxIdleTimeMS=settings.mongo_max_idle_ms,
+    waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+    serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+    uuidRepresentation="standard"
+)
 database = client[settings.database_name]
 
 # Collections
@@ -10,14 +25,99 @@ users_collection = database.get_collection("users")
 chat_history_collection = database.get_collection("chat_history")
 symptoms_collection = database.get_collection("symptoms")
 meal_plans_collection = database.get_collection("meal_plans")
+# Saved plans can be regenerated, so acknowledge writes without waiting for the journal
+diet_plans_collection = database.get_collection("diet_plans", write_concern=WriteConcern(w=1, j=False))
+
+# Cached result of the last connectivity check
+PING_CACHE_SECONDS = 5
+_last_ping_ok: bool = False
+_last_ping_ts: float = 0.0
 
 async def ping_database():
-    """Test database connection"""
-    logging.info("Testing database connection...")
+    """Test database connection (result is cached for PING_CACHE_SECONDS)"""
+    global _last_ping_ok, _last_ping_ts
+    now = time.monotonic()
+    if _last_ping_ts and now - _last_ping_ts < PING_CACHE_SECONDS:
+        return _last_ping_ok
+    
+    logger.debug("Testing database connection...")
     try:
-        await client.admin.command('ping')
-        logging.info("Successfully connected to MongoDB!")
-        return True
+        await client.admin.command({"hello": 1}, read_preference=ReadPreference.NEAREST)
+        logger.debug("Successfully connected to MongoDB!")
+        _last_ping_ok = True
     except Exception as e:
-        logging.error(f"Failed to connect to MongoDB: {e}")
-        return False
\ No newline at end of file
+        logger.error(f"Failed to connect to MongoDB: {e}")
+        _last_ping_ok = False
+    _last_ping_ts = time.monotonic()
+    return _last_ping_ok
+
+async def warm_database():
+    """Open pooled connections before serving traffic"""
+    logger.info("Warming database connection pool...")
+    try:
+        # Concurrent commands each check out their own socket, so this connects and
+        # authenticates up to mongo_min_pool_size connections now, not on the first requests
+        await asyncio.gather(
+            *(client.admin.command("ping") for _ in range(max(1, settings.mongo_min_pool_size))),
+            users_collection.estimated_document_count(),
+            chat_history_collection.estimated_document_count(),
+            symptoms_collection.estimated_document_count(),
+            meal_plans_collection.estimated_document_count(),
+            return_exceptions=True
+        )
+    except Exception as e:
+        logger.error(f"Failed to warm database connection pool: {e}")
+
+def close_database():
+    """Close the shared client and its connection pool"""
+    client.close()
+
+# Set once each index is confirmed; registration relies on the unique email index
+_email_index_ready: bool = False
+_diet_plans_index_ready: bool = False
+
+async def ensure_email_index() -> bool:
+    """Create the unique index on users.email; returns whether it is confirmed
+
+    Cheap once it has succeeded, so callers can retry it until the database is reachable.
+    """
+    global _email_index_ready
+    if not _email_index_ready:
+        try:
+            await users_collection.create_index("email", unique=True)
+            _email_index_ready = True
+        except Exception as e:
+            # Also fails if duplicate emails already exist and need cleaning up
+            logger.error(f"Failed to create unique email index: {e}")
+    return _email_index_ready
+
+async def ensure_diet_plans_index() -> bool:
+    """Create the per-user plan listing index; returns whether it is confirmed"""
+    global _diet_plans_index_ready
+    if not _diet_plans_index_ready:
+        try:
+            # Covers the per-user plan listing filter and its newest-first sort
+            await diet_plans_collection.create_index(
+                [("user_id", 1), ("is_active", 1), ("created_at", -1)]
+            )
+            _diet_plans_index_ready = True
+        except Exception as e:
+            logger.error(f"Failed to create diet plans index: {e}")
+    return _diet_plans_index_ready
+
+async def ensure_indexes() -> bool:
+    """Create the indexes the API relies on (no-op for those already confirmed)"""
+    email_ok, diet_plans_ok = await asyncio.gather(ensure_email_index(), ensure_diet_plans_index())
+    return email_ok and diet_plans_ok
+
+async def insert_many_unordered(collection, documents):
+    """Insert several documents in one round-trip (e.g. the entries of a SymptomLog)"""
+    if not documents:
+        return None
+    return await collection.insert_many(documents, ordered=False)
+
+async def bulk_write(collection, operations):
+    """Send a batch of mixed write operations in one round-trip"""
+    if not operations:
+        return None
+    return await collection.bulk_write(operations, ordered=False)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 class Settings(BaseSettings):
     mongodb_url: str = "mongodb://localhost:27017"
@@ -10,6 +10,20 @@ class Settings(BaseSettings):
     huggingface_api_token: str = ""
     frontend_url: str = "http://localhost:3000"
     environment: str = "development"
+    # Extra exact-match CORS origins allowed alongside frontend_url (incl. production)
+    cors_origins: List[str] = ["http://localhost:3000", "https://pcos-chatbot.vercel.app"]
+    # Vercel team/account slug that ends this project's preview URLs
+    # (pcos-chatbot-<hash>-<scope>.vercel.app); previews are not allowed while unset
+    vercel_scope: Optional[str] = None
+    # Set ENABLE_DB=false to run a smoke-test app without MongoDB or the API routers
+    enable_db: bool = True
+    
+    # MongoDB connection pool (per worker process)
+    mongo_max_pool_size: int = 50
+    mongo_min_pool_size: int = 5
+    mongo_max_idle_ms: int = 30000
+    mongo_wait_queue_timeout_ms: int = 10000
+    mongo_server_selection_timeout_ms: int = 5000
     
     class Config:
         env_file = ".env"
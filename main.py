@@ -1,91 +1,219 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
-from config.database import ping_database
+from config.database import ping_database, warm_database, ensure_indexes, close_database
 from config.settings import settings
-from routes import auth, chat, diet
+import asyncio
+import logging
+import logging.handlers
 import os
+import queue
+import re
+from typing import Optional
+
+# Handlers write from a background thread so logging never blocks the event loop.
+# The listener runs for the lifespan of each app; records logged outside it wait in the queue
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    # The listener's handler applies the real format; this one only renders the message
+    format="%(message)s",
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
+)
+logger = logging.getLogger(__name__)
+
+# Set once background startup completes; gates the API routes and the readiness probe
+_ready = asyncio.Event()
+
+# Served while background startup is still running
+_ALWAYS_AVAILABLE = frozenset({"/", "/health", "/health/live", "/health/ready"})
+
+def _import_routers():
+    from routes import auth, chat, diet
+    return auth.router, chat.router, diet.router
+
+async def _deferred_init(app: FastAPI):
+    """Import and register the API routers once the server is up"""
+    if getattr(app.state, "routers_loaded", False):
+        return
+    
+    # Imported off the event loop so the Hugging Face client stack doesn't hold up the port bind
+    for router in await asyncio.to_thread(_import_routers):
+        app.include_router(router)
+    app.state.routers_loaded = True
+
+async def _connect_database():
+    """Check, warm and index the database before serving traffic"""
+    db_connected = await ping_database()
+    if not db_connected:
+        logger.warning("⚠️  Running without database - some features will be limited")
+    else:
+        await warm_database()
+        await ensure_indexes()
+        logger.info("✅ Database connected successfully")
+
+async def _startup(app: FastAPI):
+    """Attach routers and connect the database after the server starts accepting connections"""
+    try:
+        await _deferred_init(app)
+        await _connect_database()
+        
+        # Load the Hugging Face models in the background; readiness doesn't wait on it
+        from utils.huggingface import hf_service
+        app.state.warmup_task = asyncio.create_task(hf_service.warm_up())
+        
+        logger.info("🤖 Hugging Face integration ready")
+        logger.info("📱 API is ready to serve requests!")
+        _ready.set()
+    except Exception:
+        logger.exception("Background startup failed")
+
+class _StartupGate:
+    """Answer 503 for API routes until background startup has attached them"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not _ready.is_set() and scope["path"] not in _ALWAYS_AVAILABLE:
+            response = ORJSONResponse(
+                {"detail": "Service warming up"},
+                status_code=503,
+                headers={"Retry-After": "5"}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
 
 # Application lifespan
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    print("🚀 Starting PCOS Health Assistant API...")
+    _log_listener.start()
+    logger.info("🚀 Starting PCOS Health Assistant API...")
+    logger.info("🌐 CORS enabled for: %s", settings.frontend_url)
     
-    # Test database connection
-    db_connected = await ping_database()
-    if not db_connected:
-        print("⚠️  Running without database - some features will be limited")
+    if not settings.enable_db:
+        logger.warning("⚠️  Database disabled - serving health endpoints only")
+        _ready.set()
     else:
-        print("✅ Database connected successfully")
-    
-    print(f"🌐 CORS enabled for: {settings.frontend_url}")
-    print("🤖 Hugging Face integration ready")
-    print("📱 API is ready to serve requests!")
+        # Returning right away lets uvicorn bind the port; routes answer 503 until this finishes
+        app.state.startup_task = asyncio.create_task(_startup(app))
     
     yield
     
     # Shutdown
-    print("👋 Shutting down PCOS Health Assistant API...")
+    _ready.clear()
+    logger.info("👋 Shutting down PCOS Health Assistant API...")
+    for task_name in ("startup_task", "warmup_task"):
+        task = getattr(app.state, task_name, None)
+        if task is not None and not task.done():
+            task.cancel()
+    if getattr(app.state, "routers_loaded", False):
+        from utils.huggingface import hf_service
+        await hf_service.aclose()
+    if settings.enable_db:
+        close_database()
+    _log_listener.stop()
 
-# Create FastAPI app
-app = FastAPI(
-    title="PCOS Health Assistant API",
-    description="AI-powered assistant for PCOS management and support",
-    version="1.0.0",
-    lifespan=lifespan
-)
+def _vercel_preview_origin_regex() -> Optional[str]:
+    """Match only this project's Vercel previews; credentialed CORS must not trust other projects"""
+    if not settings.vercel_scope:
+        return None
+    return rf"^https://pcos-chatbot-[a-z0-9-]+-{re.escape(settings.vercel_scope)}\.vercel\.app$"
 
-# CORS middleware - Updated for production
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        settings.frontend_url,
-        "https://*.vercel.app",  # Allow Vercel preview URLs
-        "http://localhost:3000",  # Local development
-    ],
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"],
-)
+def create_app() -> FastAPI:
+    """Create a lightweight app shell; routers are attached in the background after startup"""
+    app = FastAPI(
+        title="PCOS Health Assistant API",
+        description="AI-powered assistant for PCOS management and support",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse
+    )
 
-# Include routers
-app.include_router(auth.router)
-app.include_router(chat.router)
-app.include_router(diet.router)
-
-# Root endpoint
-@app.get("/")
-async def root():
-    return {
-        "message": "Welcome to PCOS Health Assistant API",
-        "version": "1.0.0",
-        "status": "healthy",
-        "environment": os.getenv("ENVIRONMENT", "production"),
-        "features": [
-            "User Authentication",
-            "AI-Powered Chat Assistant",
-            "PCOS Knowledge Base",
-            "Symptom Tracking (Coming Soon)",
-            "Meal Planning (Coming Soon)"
-        ]
-    }
-
-# Health check endpoint
-@app.get("/health")
-async def health_check():
-    try:
-        db_status = await ping_database()
+    app.add_middleware(_StartupGate)
+
+    # CORS middleware - Updated for production (added last so it also wraps the startup gate)
+    app.add_middleware(
+        CORSMiddleware,
+        # Exact origins are a set lookup; the regex only runs for other origins
+        allow_origins=[settings.frontend_url, *settings.cors_origins],
+        allow_origin_regex=_vercel_preview_origin_regex(),
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["*"],
+    )
+
+    # Root endpoint
+    @app.get("/")
+    async def root():
         return {
+            "message": "Welcome to PCOS Health Assistant API",
+            "version": "1.0.0",
             "status": "healthy",
-            "database": "connected" if db_status else "disconnected",
-            "api": "running",
-            "environment": os.getenv("ENVIRONMENT", "production")
+            "environment": os.getenv("ENVIRONMENT", "production"),
+            "features": [
+                "User Authentication",
+                "AI-Powered Chat Assistant",
+                "PCOS Knowledge Base",
+                "Symptom Tracking (Coming Soon)",
+                "Meal Planning (Coming Soon)"
+            ]
         }
-    except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
+
+    # Liveness probe - never touches the database and is the only check that always returns 200
+    @app.get("/health/live")
+    async def live():
+        return {"status": "live"}
+
+    # Readiness probe (/health kept for backward compatibility)
+    @app.get("/health")
+    @app.get("/health/ready")
+    async def health_check():
+        if not _ready.is_set():
+            raise HTTPException(status_code=503, detail="Service warming up")
+        try:
+            if settings.enable_db:
+                if not await ping_database():
+                    raise HTTPException(status_code=503, detail="Database unavailable")
+                # Retried (and failures logged) until the indexes exist, e.g. when the DB
+                # was down at startup; registration checks its own index separately
+                await ensure_indexes()
+                db_status = "connected"
+            else:
+                db_status = "disabled"
+            return {
+                "status": "healthy",
+                "database": db_status,
+                "api": "running",
+                "environment": os.getenv("ENVIRONMENT", "production")
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
+    
+    return app
+
+# Create FastAPI app
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    # Each worker opens its own MongoDB pool: keep
+    # mongo_max_pool_size * WEB_CONCURRENCY below the cluster connection limit
+    workers = int(os.environ.get("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools"
+    )
\ No newline at end of file
@@ -8,10 +8,16 @@ class UserCreate(BaseModel):
     name: str = Field(..., min_length=2, max_length=50)
     email: EmailStr
     password: str = Field(..., min_length=6)
+    
+    class Config:
+        extra = "forbid"
 
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
+    
+    class Config:
+        extra = "forbid"
 
 class User(BaseModel):
     id: str = Field(alias="_id")
@@ -37,6 +43,10 @@ class TokenData(BaseModel):
 # Chat Models
 class ChatMessage(BaseModel):
     message: str = Field(..., min_length=1, max_length=1000)
+    
+    class Config:
+        extra = "forbid"
+        str_strip_whitespace = True
 
 class ChatResponse(BaseModel):
     message_id: str
@@ -85,6 +95,11 @@ class DietPreferences(BaseModel):
     budget: Budget = Budget.MODERATE
     avoid_foods: List[str] = Field(default_factory=list)
     preferred_foods: List[str] = Field(default_factory=list)
+    
+    class Config:
+        use_enum_values = True
+        extra = "forbid"
+        str_strip_whitespace = True
 
 class MealInfo(BaseModel):
     name: str
@@ -98,6 +113,9 @@ class DayMeals(BaseModel):
     lunch: Optional[MealInfo] = None
     dinner: Optional[MealInfo] = None
     snack: Optional[MealInfo] = None
+    
+    class Config:
+        frozen = True
 
 class GroceryList(BaseModel):
     proteins: List[str] = Field(default_factory=list)
@@ -107,6 +125,9 @@ class GroceryList(BaseModel):
     dairy: List[str] = Field(default_factory=list)
     pantry: List[str] = Field(default_factory=list)
     spices: List[str] = Field(default_factory=list)
+    
+    class Config:
+        frozen = True
 
 class DietPlanResponse(BaseModel):
     success: bool
@@ -117,6 +138,23 @@ class DietPlanResponse(BaseModel):
     error: Optional[str] = None
     fallback_plan: Optional[Dict[str, Any]] = None
 
+class SavedDietPlanSummary(BaseModel):
+    """Saved plan metadata for list views (no plan body or grocery list)"""
+    id: str = Field(alias="_id")
+    user_id: str
+    plan_name: str
+    preferences: DietPreferences
+    created_at: datetime
+    is_active: bool = True
+    
+    class Config:
+        populate_by_name = True
+        use_enum_values = True
+
+class SavedDietPlanPage(BaseModel):
+    items: List[SavedDietPlanSummary]
+    total: int
+
 class SavedDietPlan(BaseModel):
     id: str = Field(alias="_id")
     user_id: str
@@ -129,6 +167,7 @@ class SavedDietPlan(BaseModel):
     
     class Config:
         populate_by_name = True
+        use_enum_values = True
 
 # Symptom Models
 class SymptomSeverity(str, Enum):
@@ -141,6 +180,9 @@ class SymptomEntry(BaseModel):
     severity: SymptomSeverity
     date: datetime
     notes: Optional[str] = None
+    
+    class Config:
+        use_enum_values = True
 
 class SymptomLog(BaseModel):
     user_id: str
@@ -166,6 +208,9 @@ class MealPlan(BaseModel):
     date: datetime
     meals: dict[MealType, Meal]
     total_calories: Optional[int] = None
+    
+    class Config:
+        use_enum_values = True
 
 # Quick Diet Request (simplified)
 class QuickDietRequest(BaseModel):
@@ -173,6 +218,10 @@ class QuickDietRequest(BaseModel):
     days: int = Field(default=3, ge=1, le=7)
     calorie_goal: int = Field(default=1800, ge=1200, le=3000)
     symptoms: List[str] = Field(default_factory=list)
+    
+    class Config:
+        extra = "forbid"
+        str_strip_whitespace = True
 
 # General Response Models
 class MessageResponse(BaseModel):
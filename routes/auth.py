@@ -1,53 +1,62 @@
 from datetime import timedelta
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import HTTPAuthorizationCredentials
-from config.database import users_collection
+from config.database import users_collection, ensure_email_index
 from config.settings import settings
 from models.schemas import UserCreate, UserLogin, Token, User, MessageResponse
 from utils.auth import (
-    get_password_hash, 
+    get_password_hash_async, 
     authenticate_user, 
     create_access_token, 
-    get_current_user,
-    get_user_by_email
+    get_current_user
 )
-from datetime import datetime
+from datetime import datetime, timezone
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
+ACCESS_TOKEN_EXPIRES = timedelta(minutes=settings.access_token_expire_minutes)
+
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserCreate):
     """Register a new user"""
     
-    # Check if user already exists
-    existing_user = await get_user_by_email(user_data.email)
-    if existing_user:
+    # Duplicate emails are only rejected once the unique index exists
+    if not await ensure_email_index():
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Registration is temporarily unavailable. Please try again."
         )
     
+    now = datetime.now(timezone.utc)
+    
     # Hash password
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     # Create user document
     user_doc = {
         "name": user_data.name,
         "email": user_data.email,
         "hashed_password": hashed_password,
-        "created_at": datetime.utcnow()
+        "created_at": now
     }
     
-    # Insert user into database
-    result = await users_collection.insert_one(user_doc)
+    # Insert user into database (unique index on email rejects duplicates)
+    try:
+        result = await users_collection.insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     user_doc["_id"] = result.inserted_id
     
     # Create access token
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
         data={"sub": user_data.email}, 
-        expires_delta=access_token_expires
+        expires_delta=ACCESS_TOKEN_EXPIRES,
+        now=now
     )
     
     # Prepare user response
@@ -78,10 +87,9 @@ async def login(user_credentials: UserLogin):
         )
     
     # Create access token
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
         data={"sub": user["email"]}, 
-        expires_delta=access_token_expires
+        expires_delta=ACCESS_TOKEN_EXPIRES
     )
     
     # Prepare user response
@@ -2,7 +2,11 @@ from fastapi import APIRouter, HTTPException, status
 from models.schemas import ChatMessage, ChatResponse
 from utils.huggingface import hf_service
 from utils.auth import generate_unique_id
-from datetime import datetime
+from utils.sse import event_stream_response
+from datetime import datetime, timezone
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -20,12 +24,25 @@ async def send_message(message_data: ChatMessage):
         return ChatResponse(
             message_id=message_id,
             response=ai_response,
-            timestamp=datetime.utcnow()
+            timestamp=datetime.now(timezone.utc)
         )
         
     except Exception as e:
-        print(f"Chat error: {e}")  # Log the error
+        logger.exception("Chat error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing message: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/stream")
+async def stream_message(message_data: ChatMessage):
+    """Stream the assistant's reply as Server-Sent Events"""
+    
+    message_id = generate_unique_id()
+    
+    return event_stream_response(
+        ({"delta": chunk} async for chunk in hf_service.generate_stream(message_data.message)),
+        done={"message_id": message_id, "done": True},
+        error_message="Error processing message",
+        log_message="Chat stream error"
+    )
@@ -1,23 +1,162 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status, Depends, Query, Response
+from fastapi.responses import ORJSONResponse
+from typing import Dict, Optional
 from models.schemas import (
     DietPreferences, 
     DietPlanResponse, 
     QuickDietRequest,
     SavedDietPlan,
+    SavedDietPlanPage,
     User,
     MessageResponse
 )
 from utils.huggingface import hf_service
 from utils.auth import get_current_user, generate_unique_id
-from config.database import database
-from datetime import datetime
+from utils.sse import event_stream_response
+from config.database import diet_plans_collection
+from datetime import datetime, timezone
 from bson import ObjectId
+from cachetools import TTLCache
+import asyncio
+import functools
+import hashlib
+import logging
+import orjson
 
-router = APIRouter(prefix="/diet", tags=["diet"])
+logger = logging.getLogger(__name__)
 
-# Collection for saved diet plans
-diet_plans_collection = database.get_collection("diet_plans")
+router = APIRouter(prefix="/diet", tags=["diet"], default_response_class=ORJSONResponse)
+
+# Static suggestion data, serialized once at import
+SYMPTOM_SUGGESTIONS = {
+    "insulin_resistance": {
+        "focus": "Low glycemic index foods",
+        "include": ["quinoa", "sweet potatoes", "legumes", "nuts", "leafy greens"],
+        "avoid": ["white bread", "sugary drinks", "processed snacks", "white rice"],
+        "tip": "Eat protein and fiber with each meal to stabilize blood sugar"
+    },
+    "weight_gain": {
+        "focus": "Portion control and nutrient density",
+        "include": ["lean proteins", "vegetables", "healthy fats", "whole grains"],
+        "avoid": ["fried foods", "large portions", "liquid calories", "processed foods"],
+        "tip": "Focus on feeling satisfied rather than full, eat slowly"
+    },
+    "irregular_periods": {
+        "focus": "Hormone-balancing foods",
+        "include": ["omega-3 rich fish", "flax seeds", "spearmint tea", "cinnamon"],
+        "avoid": ["excess dairy", "inflammatory foods", "alcohol", "caffeine"],
+        "tip": "Maintain consistent meal timing to support hormonal rhythm"
+    },
+    "bloating": {
+        "focus": "Anti-inflammatory and easy-to-digest foods",
+        "include": ["ginger", "fennel", "cucumber", "yogurt with probiotics"],
+        "avoid": ["carbonated drinks", "beans initially", "cruciferous veggies", "artificial sweeteners"],
+        "tip": "Eat smaller, more frequent meals and chew thoroughly"
+    },
+    "mood_swings": {
+        "focus": "Blood sugar stability and mood-supporting nutrients",
+        "include": ["complex carbs", "magnesium-rich foods", "omega-3s", "B vitamins"],
+        "avoid": ["sugar spikes", "caffeine excess", "alcohol", "skipping meals"],
+        "tip": "Regular meal timing and protein at each meal supports stable mood"
+    }
+}
+
+MEAL_IDEAS = {
+    "breakfast": {
+        "vegetarian": [
+            {
+                "name": "PCOS Power Bowl",
+                "ingredients": ["Greek yogurt", "berries", "chia seeds", "almond butter", "cinnamon"],
+                "calories": 320,
+                "prep_time": "5 minutes"
+            },
+            {
+                "name": "Veggie Scramble",
+                "ingredients": ["eggs", "spinach", "bell peppers", "avocado", "herbs"],
+                "calories": 280,
+                "prep_time": "10 minutes"
+            }
+        ],
+        "vegan": [
+            {
+                "name": "Overnight Oats",
+                "ingredients": ["oats", "almond milk", "chia seeds", "berries", "nuts"],
+                "calories": 300,
+                "prep_time": "5 minutes prep, overnight"
+            }
+        ]
+    },
+    "lunch": {
+        "vegetarian": [
+            {
+                "name": "Quinoa Buddha Bowl",
+                "ingredients": ["quinoa", "roasted vegetables", "chickpeas", "tahini dressing"],
+                "calories": 450,
+                "prep_time": "25 minutes"
+            }
+        ]
+    },
+    "dinner": {
+        "vegetarian": [
+            {
+                "name": "Lentil Curry",
+                "ingredients": ["lentils", "coconut milk", "spinach", "spices", "brown rice"],
+                "calories": 400,
+                "prep_time": "30 minutes"
+            }
+        ]
+    },
+    "snack": {
+        "vegetarian": [
+            {
+                "name": "Apple with Almond Butter",
+                "ingredients": ["apple", "almond butter", "cinnamon"],
+                "calories": 180,
+                "prep_time": "2 minutes"
+            }
+        ]
+    }
+}
+
+STREAM_ERROR_MESSAGE = "Unable to generate diet plan at the moment. Please try again."
+
+STATIC_CACHE_HEADERS = {"Cache-Control": "public, max-age=86400"}
+_SYMPTOM_SUGGESTIONS_JSON = orjson.dumps(SYMPTOM_SUGGESTIONS)
+_MEAL_IDEAS_JSON = {
+    meal_type: {style: orjson.dumps(ideas) for style, ideas in styles.items()}
+    for meal_type, styles in MEAL_IDEAS.items()
+}
+_DEFAULT_MEAL_IDEAS_JSON = _MEAL_IDEAS_JSON["breakfast"]["vegetarian"]
+
+# Generated plans keyed by a hash of the preferences that produced them
+_plan_cache: TTLCache = TTLCache(maxsize=1024, ttl=6 * 60 * 60)
+
+# Generations in progress, so concurrent misses for the same key share one Mistral call
+_plan_inflight: Dict[str, asyncio.Task] = {}
+
+def _store_generated_plan(key: str, task: asyncio.Task):
+    _plan_inflight.pop(key, None)
+    if task.cancelled() or task.exception() is not None:
+        return
+    result = task.result()
+    # A plan whose model output didn't parse comes back empty; don't serve it to everyone
+    if result["success"] and result["diet_plan"]:
+        _plan_cache[key] = result
+
+async def _generate_plan_cached(user_preferences: dict) -> dict:
+    """Generate a diet plan, reusing a recent successful result for identical preferences"""
+    key = hashlib.blake2b(orjson.dumps(user_preferences, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    cached = _plan_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    task = _plan_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(hf_service.generate_diet_plan(user_preferences))
+        _plan_inflight[key] = task
+        task.add_done_callback(functools.partial(_store_generated_plan, key))
+    # Shielded so one client disconnecting doesn't cancel the call the others wait on
+    return await asyncio.shield(task)
 
 @router.post("/generate", response_model=DietPlanResponse)
 async def generate_diet_plan(preferences: DietPreferences):
@@ -25,20 +164,10 @@ async def generate_diet_plan(preferences: DietPreferences):
     
     try:
         # Convert preferences to dict for the service
-        user_preferences = {
-            "dietary_style": preferences.dietary_style.value,
-            "calorie_goal": preferences.calorie_goal,
-            "days": preferences.days,
-            "allergies": preferences.allergies,
-            "symptoms": [symptom.value for symptom in preferences.symptoms],
-            "cuisine": preferences.cuisine.value,
-            "budget": preferences.budget.value,
-            "avoid_foods": preferences.avoid_foods,
-            "preferred_foods": preferences.preferred_foods
-        }
+        user_preferences = preferences.model_dump(mode="json")
         
         # Generate diet plan using Mistral AI
-        result = await hf_service.generate_diet_plan(user_preferences)
+        result = await _generate_plan_cached(user_preferences)
         
         if not result["success"]:
             return DietPlanResponse(
@@ -47,21 +176,49 @@ async def generate_diet_plan(preferences: DietPreferences):
                 fallback_plan=result.get("fallback_plan")
             )
         
-        return DietPlanResponse(
-            success=True,
-            diet_plan=result["diet_plan"],
-            user_preferences=preferences,
-            generated_at=result["generated_at"],
-            grocery_list=result["grocery_list"]
-        )
+        # Returned as a plain dict: FastAPI validates it against response_model
+        # once, instead of validating a constructed model and then re-validating it
+        return {
+            "success": True,
+            "diet_plan": result["diet_plan"],
+            "user_preferences": user_preferences,
+            "generated_at": result["generated_at"],
+            "grocery_list": result["grocery_list"]
+        }
         
     except Exception as e:
-        print(f"Diet generation error: {e}")
+        logger.exception("Diet generation error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating diet plan: {str(e)}"
         )
 
+@router.post("/generate/stream")
+async def stream_diet_plan(preferences: DietPreferences):
+    """Stream a PCOS-friendly diet plan from Mistral AI as Server-Sent Events"""
+    
+    user_preferences = preferences.model_dump(mode="json")
+    
+    return event_stream_response(
+        ({"delta": chunk} async for chunk in hf_service.generate_diet_plan_stream(user_preferences)),
+        done={"done": True},
+        error_message=STREAM_ERROR_MESSAGE,
+        log_message="Diet plan stream error"
+    )
+
+@router.post("/generate/stream/days")
+async def stream_diet_plan_days(preferences: DietPreferences):
+    """Stream a diet plan as Server-Sent Events, one parsed day per event"""
+    
+    user_preferences = preferences.model_dump(mode="json")
+    
+    return event_stream_response(
+        ({"day": day} async for day in hf_service.stream_diet_plan(user_preferences)),
+        done={"done": True},
+        error_message=STREAM_ERROR_MESSAGE,
+        log_message="Diet plan day stream error"
+    )
+
 @router.post("/quick-generate", response_model=DietPlanResponse)
 async def quick_generate_diet_plan(request: QuickDietRequest):
     """Generate a quick diet plan with minimal inputs"""
@@ -80,7 +237,7 @@ async def quick_generate_diet_plan(request: QuickDietRequest):
             "preferred_foods": []
         }
         
-        result = await hf_service.generate_diet_plan(user_preferences)
+        result = await _generate_plan_cached(user_preferences)
         
         if not result["success"]:
             return DietPlanResponse(
@@ -89,81 +246,88 @@ async def quick_generate_diet_plan(request: QuickDietRequest):
                 fallback_plan=result.get("fallback_plan")
             )
         
-        return DietPlanResponse(
-            success=True,
-            diet_plan=result["diet_plan"],
-            generated_at=result["generated_at"],
-            grocery_list=result["grocery_list"]
-        )
+        return {
+            "success": True,
+            "diet_plan": result["diet_plan"],
+            "generated_at": result["generated_at"],
+            "grocery_list": result["grocery_list"]
+        }
         
     except Exception as e:
-        print(f"Quick diet generation error: {e}")
+        logger.exception("Quick diet generation error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating quick diet plan: {str(e)}"
         )
 
+async def _insert_diet_plan(diet_plan_doc: dict):
+    """Persist a diet plan after the response has been sent"""
+    try:
+        await diet_plans_collection.insert_one(diet_plan_doc)
+    except Exception:
+        logger.exception("Save diet plan error")
+
 @router.post("/save", response_model=MessageResponse)
 async def save_diet_plan(
     plan_name: str,
     diet_plan_data: dict,
     preferences: DietPreferences,
     grocery_list: dict,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
-    """Save a generated diet plan for the authenticated user"""
+    """Save a generated diet plan for the authenticated user
     
-    try:
-        # Create diet plan document
-        diet_plan_doc = {
-            "user_id": current_user.id,
-            "plan_name": plan_name,
-            "diet_plan": diet_plan_data,
-            "preferences": preferences.dict(),
-            "grocery_list": grocery_list,
-            "created_at": datetime.utcnow(),
-            "is_active": True
-        }
-        
-        # Insert into database
-        result = await diet_plans_collection.insert_one(diet_plan_doc)
-        
-        if result.inserted_id:
-            return MessageResponse(message=f"Diet plan '{plan_name}' saved successfully!")
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to save diet plan"
-            )
-            
-    except Exception as e:
-        print(f"Save diet plan error: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error saving diet plan: {str(e)}"
-        )
+    The insert runs as a background task after the response is sent, so a
+    database failure is logged rather than returned to the client.
+    """
+    
+    # Create diet plan document
+    diet_plan_doc = {
+        "user_id": current_user.id,
+        "plan_name": plan_name,
+        "diet_plan": diet_plan_data,
+        "preferences": preferences.model_dump(mode="json"),
+        "grocery_list": grocery_list,
+        "created_at": datetime.now(timezone.utc),
+        "is_active": True
+    }
+    
+    background_tasks.add_task(_insert_diet_plan, diet_plan_doc)
+    return MessageResponse(message=f"Diet plan '{plan_name}' saved successfully!")
 
-@router.get("/my-plans", response_model=List[SavedDietPlan])
-async def get_my_diet_plans(current_user: User = Depends(get_current_user)):
-    """Get all saved diet plans for the authenticated user"""
+@router.get("/my-plans", response_model=SavedDietPlanPage)
+async def get_my_diet_plans(
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=100),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a page of saved diet plans for the authenticated user (use /plan/{plan_id} for the full plan)"""
     
     try:
-        plans_cursor = diet_plans_collection.find(
-            {"user_id": current_user.id, "is_active": True}
-        ).sort("created_at", -1)
-        
-        plans = await plans_cursor.to_list(length=100)
+        # One round-trip returns the page and the total count. The match and
+        # sort run before $facet so they use the (user_id, is_active, created_at)
+        # index, and the large plan bodies are projected out before paging
+        pipeline = [
+            {"$match": {"user_id": current_user.id, "is_active": True}},
+            {"$sort": {"created_at": -1}},
+            {"$project": {"diet_plan": 0, "grocery_list": 0}},
+            {"$facet": {
+                "items": [{"$skip": skip}, {"$limit": limit}],
+                "total": [{"$count": "n"}]
+            }}
+        ]
+        result = await diet_plans_collection.aggregate(pipeline).to_list(length=1)
+        page = result[0] if result else {"items": [], "total": []}
         
-        # Convert to response models
-        saved_plans = []
+        # Validated once against response_model by FastAPI
+        plans = page["items"]
         for plan in plans:
-            plan["id"] = str(plan["_id"])
-            saved_plans.append(SavedDietPlan(**plan))
-        
-        return saved_plans
+            plan["_id"] = str(plan["_id"])
+        return {"items": plans, "total": page["total"][0]["n"] if page["total"] else 0}
         
     except Exception as e:
-        print(f"Get diet plans error: {e}")
+        logger.exception("Get diet plans error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving diet plans: {str(e)}"
@@ -173,6 +337,12 @@ async def get_my_diet_plans(current_user: User = Depends(get_current_user)):
 async def get_diet_plan(plan_id: str, current_user: User = Depends(get_current_user)):
     """Get a specific diet plan by ID"""
     
+    if not ObjectId.is_valid(plan_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Diet plan not found"
+        )
+    
     try:
         plan = await diet_plans_collection.find_one({
             "_id": ObjectId(plan_id),
@@ -186,11 +356,13 @@ async def get_diet_plan(plan_id: str, current_user: User = Depends(get_current_u
                 detail="Diet plan not found"
             )
         
-        plan["id"] = str(plan["_id"])
-        return SavedDietPlan(**plan)
+        plan["_id"] = str(plan["_id"])
+        return plan
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Get diet plan error: {e}")
+        logger.exception("Get diet plan error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving diet plan: {str(e)}"
@@ -200,6 +372,12 @@ async def get_diet_plan(plan_id: str, current_user: User = Depends(get_current_u
 async def delete_diet_plan(plan_id: str, current_user: User = Depends(get_current_user)):
     """Delete a diet plan (soft delete)"""
     
+    if not ObjectId.is_valid(plan_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Diet plan not found"
+        )
+    
     try:
         result = await diet_plans_collection.update_one(
             {"_id": ObjectId(plan_id), "user_id": current_user.id},
@@ -214,8 +392,10 @@ async def delete_diet_plan(plan_id: str, current_user: User = Depends(get_curren
         
         return MessageResponse(message="Diet plan deleted successfully")
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Delete diet plan error: {e}")
+        logger.exception("Delete diet plan error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error deleting diet plan: {str(e)}"
@@ -224,104 +404,15 @@ async def delete_diet_plan(plan_id: str, current_user: User = Depends(get_curren
 @router.get("/suggestions/symptoms")
 async def get_symptom_based_suggestions():
     """Get diet suggestions based on common PCOS symptoms"""
-    
-    suggestions = {
-        "insulin_resistance": {
-            "focus": "Low glycemic index foods",
-            "include": ["quinoa", "sweet potatoes", "legumes", "nuts", "leafy greens"],
-            "avoid": ["white bread", "sugary drinks", "processed snacks", "white rice"],
-            "tip": "Eat protein and fiber with each meal to stabilize blood sugar"
-        },
-        "weight_gain": {
-            "focus": "Portion control and nutrient density",
-            "include": ["lean proteins", "vegetables", "healthy fats", "whole grains"],
-            "avoid": ["fried foods", "large portions", "liquid calories", "processed foods"],
-            "tip": "Focus on feeling satisfied rather than full, eat slowly"
-        },
-        "irregular_periods": {
-            "focus": "Hormone-balancing foods",
-            "include": ["omega-3 rich fish", "flax seeds", "spearmint tea", "cinnamon"],
-            "avoid": ["excess dairy", "inflammatory foods", "alcohol", "caffeine"],
-            "tip": "Maintain consistent meal timing to support hormonal rhythm"
-        },
-        "bloating": {
-            "focus": "Anti-inflammatory and easy-to-digest foods",
-            "include": ["ginger", "fennel", "cucumber", "yogurt with probiotics"],
-            "avoid": ["carbonated drinks", "beans initially", "cruciferous veggies", "artificial sweeteners"],
-            "tip": "Eat smaller, more frequent meals and chew thoroughly"
-        },
-        "mood_swings": {
-            "focus": "Blood sugar stability and mood-supporting nutrients",
-            "include": ["complex carbs", "magnesium-rich foods", "omega-3s", "B vitamins"],
-            "avoid": ["sugar spikes", "caffeine excess", "alcohol", "skipping meals"],
-            "tip": "Regular meal timing and protein at each meal supports stable mood"
-        }
-    }
-    
-    return suggestions
+    return Response(
+        content=_SYMPTOM_SUGGESTIONS_JSON,
+        media_type="application/json",
+        headers=STATIC_CACHE_HEADERS
+    )
 
 @router.get("/meal-ideas/{meal_type}")
 async def get_meal_ideas(meal_type: str, dietary_style: str = "vegetarian"):
     """Get PCOS-friendly meal ideas for specific meal types"""
     
-    meal_ideas = {
-        "breakfast": {
-            "vegetarian": [
-                {
-                    "name": "PCOS Power Bowl",
-                    "ingredients": ["Greek yogurt", "berries", "chia seeds", "almond butter", "cinnamon"],
-                    "calories": 320,
-                    "prep_time": "5 minutes"
-                },
-                {
-                    "name": "Veggie Scramble",
-                    "ingredients": ["eggs", "spinach", "bell peppers", "avocado", "herbs"],
-                    "calories": 280,
-                    "prep_time": "10 minutes"
-                }
-            ],
-            "vegan": [
-                {
-                    "name": "Overnight Oats",
-                    "ingredients": ["oats", "almond milk", "chia seeds", "berries", "nuts"],
-                    "calories": 300,
-                    "prep_time": "5 minutes prep, overnight"
-                }
-            ]
-        },
-        "lunch": {
-            "vegetarian": [
-                {
-                    "name": "Quinoa Buddha Bowl",
-                    "ingredients": ["quinoa", "roasted vegetables", "chickpeas", "tahini dressing"],
-                    "calories": 450,
-                    "prep_time": "25 minutes"
-                }
-            ]
-        },
-        "dinner": {
-            "vegetarian": [
-                {
-                    "name": "Lentil Curry",
-                    "ingredients": ["lentils", "coconut milk", "spinach", "spices", "brown rice"],
-                    "calories": 400,
-                    "prep_time": "30 minutes"
-                }
-            ]
-        },
-        "snack": {
-            "vegetarian": [
-                {
-                    "name": "Apple with Almond Butter",
-                    "ingredients": ["apple", "almond butter", "cinnamon"],
-                    "calories": 180,
-                    "prep_time": "2 minutes"
-                }
-            ]
-        }
-    }
-    
-    if meal_type in meal_ideas and dietary_style in meal_ideas[meal_type]:
-        return meal_ideas[meal_type][dietary_style]
-    else:
-        return meal_ideas.get("breakfast", {}).get("vegetarian", [])
\ No newline at end of file
+    content = _MEAL_IDEAS_JSON.get(meal_type, {}).get(dietary_style, _DEFAULT_MEAL_IDEAS_JSON)
+    return Response(content=content, media_type="application/json", headers=STATIC_CACHE_HEADERS)
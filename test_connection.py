@@ -1,12 +1,11 @@
 import asyncio
-import motor.motor_asyncio
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
 async def test_mongodb():
-    """Test MongoDB connection independently"""
+    """Test MongoDB connection using the app's shared pooled client"""
     mongodb_url = os.getenv("MONGODB_URL")
     
     if not mongodb_url:
@@ -15,16 +14,16 @@ async def test_mongodb():
     
     print(f"🔗 Testing connection to: {mongodb_url[:50]}...")
     
+    # Deferred so a missing MONGODB_URL is reported before the shared client is built
+    from config.database import client, database
+    
     try:
-        client = motor.motor_asyncio.AsyncIOMotorClient(mongodb_url)
-        
         # Test connection
         await client.admin.command('ping')
         print("✅ Successfully connected to MongoDB!")
         
         # Test database access
-        db = client["pcos_assistant"]
-        collection = db["test"]
+        collection = database["test"]
         
         # Insert test document
         result = await collection.insert_one({"test": "connection"})
@@ -1,5 +1,6 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
+from cachetools import TTLCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
@@ -7,11 +8,20 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from config.settings import settings
 from config.database import users_collection
 from models.schemas import TokenData, User
-import uuid
+from bson import ObjectId
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# bcrypt releases the GIL, so hashing on a thread pool keeps the event loop free
+_bcrypt_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="bcrypt")
+
+# Authenticated users keyed by email, so repeated token checks skip the database
+_user_cache: TTLCache = TTLCache(maxsize=10000, ttl=60)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -20,13 +30,25 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    """Create a JWT access token"""
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_bcrypt_pool, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_bcrypt_pool, get_password_hash, password)
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, now: Optional[datetime] = None):
+    """Create a JWT access token (pass `now` to reuse the caller's timestamp)"""
     to_encode = data.copy()
+    if now is None:
+        now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
+        expire = now + timedelta(minutes=15)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
@@ -41,7 +63,7 @@ async def authenticate_user(email: str, password: str) -> Optional[dict]:
     user = await get_user_by_email(email)
     if not user:
         return None
-    if not verify_password(password, user["hashed_password"]):
+    if not await verify_password_async(password, user["hashed_password"]):
         return None
     return user
 
@@ -63,14 +85,24 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
+    cached_user = _user_cache.get(token_data.email)
+    if cached_user is not None:
+        return cached_user
+    
     user = await get_user_by_email(email=token_data.email)
     if user is None:
         raise credentials_exception
     
     # Convert MongoDB document to User model
     user["id"] = str(user["_id"])
-    return User(**user)
+    current_user = User(**user)
+    _user_cache[token_data.email] = current_user
+    return current_user
+
+def invalidate_user(email: str):
+    """Drop a cached user after their password or profile changes"""
+    _user_cache.pop(email, None)
 
 def generate_unique_id() -> str:
-    """Generate a unique ID"""
-    return str(uuid.uuid4())
\ No newline at end of file
+    """Generate a unique ID (an ObjectId, so it can double as a MongoDB _id)"""
+    return str(ObjectId())
\ No newline at end of file
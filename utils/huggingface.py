@@ -1,11 +1,296 @@
-import requests
-import json
-from typing import Dict, Any, List, Optional
+import asyncio
+import copy
+import fnmatch
+import functools
+import hashlib
+import httpx
+import logging
+import orjson
+import random
+import re
+import string
+from collections import defaultdict
+from typing import Dict, Any, AsyncIterator, Final, List, Optional
+from cachetools import TTLCache
 from config.settings import settings
-from datetime import datetime, timedelta
+from utils.ratelimit import AdaptiveLimiter, ProviderProfile
+from datetime import datetime, timezone
 
-class HuggingFaceService:
+logger = logging.getLogger(__name__)
+
+INFERENCE_API_URL = "https://api-inference.huggingface.co/models/{model_name}"
+
+# Retry model cold starts (503) and rate limiting (429) with exponential backoff
+RETRY_STATUS_CODES = frozenset({429, 503})
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 8.0
+
+# Sent with every user call: let HF serve repeated inputs from its own response cache.
+# wait_for_model is left off so a cold model answers 503 + estimated_time and the
+# retry above applies, instead of the request hanging past the client timeout
+MODEL_OPTIONS = {"use_cache": True}
+
+# Cold models can take well over the normal request timeout to load
+WARMUP_TIMEOUT_SECONDS = 120.0
+
+# Per-model rate limits, matched in order against the model name
+PROFILES = {
+    "mistralai/*": ProviderProfile(rpm=60, max_concurrent=4),
+    "deepset/*": ProviderProfile(rpm=120, max_concurrent=4),
+    "*": ProviderProfile(rpm=60, max_concurrent=2),
+}
+
+_CALORIE_RE = re.compile(r'(\d+)\s*cal', re.IGNORECASE)
+
+def _extract_calories(text: str) -> int:
+    """Extract calorie information from text"""
+    calorie_match = _CALORIE_RE.search(text)
+    return int(calorie_match.group(1)) if calorie_match else 0
+
+# Question words for the Q&A cache key; unlike _WORD_RE this keeps digits and non-ASCII letters
+_QA_WORD_RE = re.compile(r"\w+")
+
+# Chat intent keywords. Question and greeting words match whole words only, since
+# short words like "is" and "hi" would otherwise match inside "this" or "high"
+_WORD_RE = re.compile(r"[a-z]+")
+_INTENT_KEYWORDS = {
+    "question": ("what", "how", "why", "when", "where", "should", "can", "is", "are"),
+    "greeting": ("hello", "hi", "help", "support"),
+}
+# Flattened keyword -> intent table so a message is classified in a single pass
+_KEYWORD_INTENTS = {
+    keyword: intent for intent, keywords in _INTENT_KEYWORDS.items() for keyword in keywords
+}
+
+# Topic stems match the start of a word, so "dietary", "cramping" and "exercising" still
+# route (but "great" is not "eat")
+_INTENT_STEMS = {
+    "diet": ("diet", "food", "eat", "meal", "nutrition", "plan"),
+    "symptom": ("symptom", "pain", "cramp", "bloat", "period"),
+    "exercise": ("exercis", "workout", "gym", "fitness"),
+}
+_STEM_INTENTS = {stem: intent for intent, stems in _INTENT_STEMS.items() for stem in stems}
+_STEM_RE = re.compile(
+    r"\b(" + "|".join(sorted(_STEM_INTENTS, key=len, reverse=True)) + ")"
+)
+
+# Splits after each blank line, so the pieces join back to the original text
+_PARAGRAPH_SPLIT_RE = re.compile(r"(?<=\n\n)")
+
+def _message_intents(message: str) -> frozenset:
+    """Return every intent whose keywords (or topic stems) appear in the message"""
+    message = message.lower()
+    intents = {_KEYWORD_INTENTS[word] for word in _WORD_RE.findall(message) if word in _KEYWORD_INTENTS}
+    intents.update(_STEM_INTENTS[match.group(1)] for match in _STEM_RE.finditer(message))
+    return frozenset(intents)
+
+# Common PCOS-friendly ingredients by grocery category; earlier categories win
+# when an ingredient matches keywords from several (e.g. quinoa is a protein)
+GROCERY_CATEGORY_KEYWORDS = {
+    'proteins': ('chicken', 'fish', 'salmon', 'tuna', 'eggs', 'tofu', 'lentils', 'beans', 'chickpeas', 'quinoa'),
+    'vegetables': ('spinach', 'kale', 'broccoli', 'cauliflower', 'bell pepper', 'zucchini', 'cucumber', 'tomato'),
+    'fruits': ('berries', 'apple', 'orange', 'avocado', 'lemon', 'lime'),
+    'grains': ('oats', 'brown rice', 'quinoa', 'whole wheat'),
+    'dairy': ('greek yogurt', 'cottage cheese', 'almond milk', 'coconut milk'),
+    'pantry': ('olive oil', 'nuts', 'seeds', 'vinegar', 'honey'),
+}
+_GROCERY_KEYWORD_RANK = {}
+for _rank, _keywords in enumerate(GROCERY_CATEGORY_KEYWORDS.values()):
+    for _keyword in _keywords:
+        _GROCERY_KEYWORD_RANK.setdefault(_keyword, _rank)
+_GROCERY_CATEGORIES = tuple(GROCERY_CATEGORY_KEYWORDS)
+# One alternation over every keyword scans an ingredient in a single pass
+_GROCERY_KEYWORD_RE = re.compile(
+    "|".join(re.escape(keyword) for keyword in sorted(_GROCERY_KEYWORD_RANK, key=len, reverse=True))
+)
+
+_PUNCTUATION_TO_SPACE = str.maketrans(string.punctuation, " " * len(string.punctuation))
+
+def _normalize_ingredient(ingredient: str) -> str:
+    """Lowercase, turn punctuation into spaces and collapse runs of whitespace"""
+    return " ".join(ingredient.lower().translate(_PUNCTUATION_TO_SPACE).split())
+
+# Plans repeat the same ingredient strings across days, so most lookups are cache hits
+@functools.lru_cache(maxsize=4096)
+def _categorize_ingredient(ingredient: str) -> str:
+    """Return the grocery category for an ingredient, defaulting to pantry"""
+    normalized = _normalize_ingredient(ingredient)
+    ranks = [_GROCERY_KEYWORD_RANK[match.group()] for match in _GROCERY_KEYWORD_RE.finditer(normalized)]
+    return _GROCERY_CATEGORIES[min(ranks)] if ranks else 'pantry'
+
+# Canned PCOS guidance, built once at import
+PCOS_CONTEXT: Final[str] = """
+        PCOS (Polycystic Ovary Syndrome) is a hormonal disorder affecting women of reproductive age. 
+        
+        Key aspects of PCOS management:
+        
+        Diet: Focus on low glycemic index foods, anti-inflammatory foods, lean proteins, and healthy fats. 
+        Avoid processed foods, sugary drinks, and refined carbohydrates. Good foods include leafy greens, 
+        berries, nuts, fish, lean meats, quinoa, and legumes.
+        
+        Exercise: Regular physical activity helps improve insulin sensitivity. Combination of cardio and 
+        strength training is recommended. Aim for at least 150 minutes of moderate exercise per week.
+        
+        Common symptoms: Irregular periods, weight gain, acne, hair growth, hair loss, mood changes, 
+        insulin resistance, and difficulty losing weight.
+        
+        Lifestyle: Stress management, adequate sleep (7-9 hours), and maintaining a healthy weight 
+        are crucial for managing PCOS symptoms.
+        
+        Supplements: Some women benefit from inositol, vitamin D, omega-3 fatty acids, and chromium, 
+        but consult healthcare providers before starting any supplements.
+        """
+
+DIET_ADVICE: Final[str] = """For PCOS-friendly nutrition, focus on:
+
+✅ **Include:**
+- Low glycemic index foods (quinoa, sweet potatoes, oats)
+- Anti-inflammatory foods (fatty fish, leafy greens, berries)
+- Lean proteins (chicken, fish, legumes, tofu)
+- Healthy fats (avocado, nuts, olive oil)
+- Fiber-rich foods (vegetables, fruits, whole grains)
+
+❌ **Limit:**
+- Processed and refined foods
+- Sugary drinks and snacks
+- White bread and pasta
+- Fried foods
+- Excessive dairy (some women are sensitive)
+
+💡 **Tip:** Eat balanced meals with protein, healthy fats, and complex carbs to help stabilize blood sugar levels.
+
+Would you like me to create a personalized meal plan for you? Just ask for a "diet plan" and I can generate one based on your preferences!"""
+
+SYMPTOM_ADVICE: Final[str] = """Common PCOS symptoms and management tips:
+
+🩸 **Irregular Periods:** Maintain healthy weight, manage stress, consider spearmint tea
+🤰 **Weight Management:** Focus on whole foods, portion control, regular exercise
+😔 **Mood Changes:** Regular exercise, adequate sleep, stress reduction techniques
+💊 **Insulin Resistance:** Low GI diet, regular meals, strength training
+🌿 **Natural Support:** Cinnamon, spearmint tea, and inositol may help
+
+⚠️ **Important:** Always consult your healthcare provider for personalized treatment plans and before making significant changes to your routine."""
+
+EXERCISE_ADVICE: Final[str] = """PCOS-friendly exercise recommendations:
+
+🏃‍♀️ **Cardio (3-4x/week):**
+- Brisk walking, swimming, cycling
+- 30-45 minutes moderate intensity
+- Helps with insulin sensitivity
+
+💪 **Strength Training (2-3x/week):**
+- Focus on major muscle groups
+- Improves insulin sensitivity and metabolism
+- Can help with weight management
+
+🧘‍♀️ **Stress-Reducing Activities:**
+- Yoga, pilates, tai chi
+- Helps manage cortisol levels
+- Supports hormonal balance
+
+💡 **Start gradually and listen to your body. Consistency is more important than intensity!**"""
+
+# Meals used for every day of the fallback plan when generation fails
+FALLBACK_DAY_MEALS: Final[Dict[str, Dict[str, Any]]] = {
+    "breakfast": {
+        "name": "PCOS-Friendly Oatmeal Bowl",
+        "calories": 350,
+        "ingredients": ["1/2 cup steel-cut oats", "1 tbsp almond butter", "1/4 cup berries", "1 tsp cinnamon"],
+        "prep_time": "10 minutes"
+    },
+    "lunch": {
+        "name": "Quinoa Power Salad",
+        "calories": 450,
+        "ingredients": ["1/2 cup quinoa", "2 cups spinach", "1/4 cup chickpeas", "1 tbsp olive oil", "lemon juice"],
+        "prep_time": "15 minutes"
+    },
+    "dinner": {
+        "name": "Grilled Salmon with Vegetables",
+        "calories": 500,
+        "ingredients": ["4 oz salmon", "1 cup broccoli", "1/2 cup sweet potato", "herbs", "olive oil"],
+        "prep_time": "25 minutes"
+    },
+    "snack": {
+        "name": "Greek Yogurt with Nuts",
+        "calories": 200,
+        "ingredients": ["1/2 cup Greek yogurt", "1 tbsp walnuts", "1 tsp honey"],
+        "prep_time": "2 minutes"
+    }
+}
+
+_MEAL_HEADS = frozenset({'BREAKFAST', 'LUNCH', 'DINNER', 'SNACK'})
+
+# Lines DietPlanParser acts on: day headers (colon optional) and "<field>: ..." lines
+_PLAN_LINE_RE = re.compile(
+    r'^[ \t]*(DAY [^:\n]*|(?i:BREAKFAST|LUNCH|DINNER|SNACK)(?=[ \t]*:)|(?:Ingredients|Prep time)(?=[ \t]*:))'
+    r'[ \t]*(?::(.*))?$',
+    re.MULTILINE
+)
+
+class DietPlanParser:
+    """Line-by-line state machine for the DAY/meal format requested in the diet prompt"""
+    
     def __init__(self):
+        self.plan: Dict[str, Dict[str, Any]] = {}
+        self._day: Optional[str] = None
+        self._meal: Optional[str] = None
+    
+    def feed(self, text: str):
+        """Parse a whole document, visiting only the lines the format cares about"""
+        for match in _PLAN_LINE_RE.finditer(text):
+            rest = match.group(2)
+            self._feed_head(match.group(1).strip(), '' if rest is None else ':', rest or '')
+    
+    def feed_line(self, line: str) -> Optional[str]:
+        """Consume one line of generated text; returns the key of a day it completed"""
+        head, sep, rest = line.strip().partition(':')
+        return self._feed_head(head.strip(), sep, rest)
+    
+    def _feed_head(self, head: str, sep: str, rest: str) -> Optional[str]:
+        # Day headers (a new day closes the previous one)
+        if head.startswith('DAY '):
+            completed_day = self._day
+            self._day = head.lower().replace(' ', '_')
+            self.plan[self._day] = {}
+            self._meal = None
+            return completed_day
+        
+        elif not sep or self._day is None:
+            return None
+        
+        # Meal headers: "BREAKFAST: <name> - <calories>cal"
+        elif head.upper() in _MEAL_HEADS:
+            meal_type = head.lower()
+            meal_info = rest.strip()
+            self.plan[self._day][meal_type] = {
+                'name': meal_info.split(' - ')[0],
+                'calories': _extract_calories(meal_info),
+                'ingredients': [],
+                'prep_time': ''
+            }
+            self._meal = meal_type
+        
+        elif self._meal is None:
+            return None
+        
+        elif head == 'Ingredients':
+            self.plan[self._day][self._meal]['ingredients'] = [
+                ing.strip() for ing in rest.split(',')
+            ]
+        
+        elif head == 'Prep time':
+            self.plan[self._day][self._meal]['prep_time'] = rest.strip()
+        
+        return None
+    
+    def finish(self) -> Optional[str]:
+        """Close the day still being parsed and return its key"""
+        completed_day, self._day, self._meal = self._day, None, None
+        return completed_day
+
+class HuggingFaceService:
+    def __init__(self, concurrency_limit: int = 4):
         self.api_token = settings.huggingface_api_token
         self.headers = {"Authorization": f"Bearer {self.api_token}"}
         
@@ -15,46 +300,141 @@ class HuggingFaceService:
         self.summarization_model = "facebook/bart-large-cnn"
         # Add Mistral AI for diet generation
         self.mistral_model = "mistralai/Mistral-7B-Instruct-v0.3"
+        
+        # Shared async HTTP client, opened on first use (see _client)
+        self._http_client: Optional[httpx.AsyncClient] = None
+        
+        # Caps in-flight Inference API calls to stay within HF rate limits
+        self._concurrency_limit = concurrency_limit
+        self._sem = asyncio.Semaphore(concurrency_limit)
+        
+        # Per-model limiters, created on first use from PROFILES
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        
+        # Recent Q&A answers keyed by normalized question + context
+        self._qa_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+    
+    @property
+    def _client(self) -> httpx.AsyncClient:
+        """The shared HTTP client, reopened if a previous app shutdown closed it"""
+        if self._http_client is None or self._http_client.is_closed:
+            # Async so model calls don't block the event loop; keep-alive
+            # connections are reused across bursts of chat traffic
+            self._http_client = httpx.AsyncClient(
+                # Bodies are pre-encoded with orjson, so the content type is set once here
+                headers={**self.headers, "Content-Type": "application/json"},
+                http2=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60),
+                timeout=httpx.Timeout(30.0, connect=5.0)
+            )
+        return self._http_client
+    
+    async def aclose(self):
+        """Close the shared HTTP client; the service reopens it if used again"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        # The semaphore and limiters bind to the running event loop, and a later
+        # lifespan in the same process may run on a new one
+        self._sem = asyncio.Semaphore(self._concurrency_limit)
+        self._limiters = {}
     
     async def query_model(self, model_name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Generic method to query Hugging Face models"""
-        api_url = f"https://api-inference.huggingface.co/models/{model_name}"
+        api_url = INFERENCE_API_URL.format(model_name=model_name)
         
         try:
-            response = requests.post(api_url, headers=self.headers, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error querying Hugging Face API: {e}")
+            payload = {"options": MODEL_OPTIONS, **payload}
+            for attempt in range(MAX_ATTEMPTS):
+                response = await self._post(model_name, api_url, payload)
+                
+                if response.status_code in RETRY_STATUS_CODES and attempt < MAX_ATTEMPTS - 1:
+                    delay = self._retry_delay(response, attempt)
+                    logger.warning(
+                        "Hugging Face API returned %s for %s, retrying in %.1fs",
+                        response.status_code, model_name, delay
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                
+                response.raise_for_status()
+                return orjson.loads(response.content)
+        except httpx.HTTPError as e:
+            logger.error("Error querying Hugging Face API: %s", e)
             return {"error": str(e)}
+        except ValueError as e:
+            # Non-JSON body, e.g. an HTML error page or a truncated proxy response
+            logger.error("Invalid JSON from Hugging Face API for %s: %s", model_name, e)
+            return {"error": str(e)}
+    
+    async def warm_up(self):
+        """Load the models used by the API so the first user doesn't wait on a cold start"""
+        warmup_payloads = {
+            self.qa_model: {"inputs": {"question": "What is PCOS?", "context": PCOS_CONTEXT}},
+            self.mistral_model: {"inputs": "Hello", "parameters": {"max_new_tokens": 1}},
+        }
+        await asyncio.gather(*(
+            self._warm_model(model_name, payload) for model_name, payload in warmup_payloads.items()
+        ))
+    
+    async def _warm_model(self, model_name: str, payload: Dict[str, Any]):
+        api_url = INFERENCE_API_URL.format(model_name=model_name)
+        # Skip HF's response cache so the request actually reaches (and loads) the model
+        payload = {**payload, "options": {"wait_for_model": True, "use_cache": False}}
+        try:
+            response = await self._post(model_name, api_url, payload, timeout=WARMUP_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            logger.info("Warmed up %s", model_name)
+        except Exception as e:
+            # Runs as a fire-and-forget task, so nothing else would surface the error
+            logger.warning("Warm-up failed for %s: %s", model_name, e)
+    
+    async def _post(self, model_name: str, api_url: str, payload: Dict[str, Any],
+                    timeout: Any = httpx.USE_CLIENT_DEFAULT) -> httpx.Response:
+        """POST once within the model's rate limit and the service-wide concurrency cap"""
+        limiter = self._limiter_for(model_name)
+        ticket = await limiter.acquire()
+        throttled = False
+        try:
+            async with self._sem:
+                response = await self._client.post(api_url, content=orjson.dumps(payload), timeout=timeout)
+            # Only rate limiting backs off; a 503 is a model cold start, retried without cutting the limit
+            throttled = response.status_code == 429
+            return response
+        finally:
+            await limiter.release(ticket, throttled)
+    
+    def _limiter_for(self, model_name: str) -> AdaptiveLimiter:
+        """Return the shared limiter for a model, built from its matching profile"""
+        limiter = self._limiters.get(model_name)
+        if limiter is None:
+            profile = next(
+                (profile for pattern, profile in PROFILES.items() if fnmatch.fnmatchcase(model_name, pattern)),
+                PROFILES["*"]
+            )
+            limiter = self._limiters[model_name] = AdaptiveLimiter(profile)
+        return limiter
+    
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float:
+        """Seconds to wait before retrying, preferring the server's own hint"""
+        hint = response.headers.get("Retry-After")
+        if hint is None:
+            try:
+                # A loading model reports how long it expects to take
+                hint = orjson.loads(response.content).get("estimated_time")
+            except (ValueError, AttributeError):
+                hint = None
+        try:
+            delay = float(hint)
+        except (TypeError, ValueError):
+            delay = RETRY_BASE_SECONDS * 2 ** attempt + random.uniform(0, RETRY_BASE_SECONDS)
+        return min(RETRY_MAX_SECONDS, max(0.0, delay))
     
     async def generate_diet_plan(self, user_preferences: Dict[str, Any]) -> Dict[str, Any]:
         """Generate PCOS-friendly diet plan using Mistral AI"""
         
-        # Extract user preferences
         dietary_style = user_preferences.get('dietary_style', 'vegetarian')
-        calorie_goal = user_preferences.get('calorie_goal', 1800)
         days = user_preferences.get('days', 7)
-        allergies = user_preferences.get('allergies', [])
-        symptoms = user_preferences.get('symptoms', [])
-        cuisine_preference = user_preferences.get('cuisine', 'mixed')
-        budget = user_preferences.get('budget', 'moderate')
-        
-        # Create detailed prompt for Mistral
-        prompt = self._create_diet_prompt(
-            dietary_style, calorie_goal, days, allergies, symptoms, cuisine_preference, budget
-        )
-        
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                "max_new_tokens": 1500,
-                "temperature": 0.7,
-                "do_sample": True,
-                "top_p": 0.9,
-                "return_full_text": False
-            }
-        }
+        payload = self._create_diet_payload(user_preferences)
         
         try:
             result = await self.query_model(self.mistral_model, payload)
@@ -79,18 +459,109 @@ class HuggingFaceService:
                 "success": True,
                 "diet_plan": structured_plan,
                 "user_preferences": user_preferences,
-                "generated_at": datetime.utcnow().isoformat(),
+                "generated_at": datetime.now(timezone.utc).isoformat(),
                 "grocery_list": self._generate_grocery_list(structured_plan)
             }
             
         except Exception as e:
-            print(f"Error generating diet plan: {e}")
+            logger.exception("Error generating diet plan")
             return {
                 "success": False,
                 "error": str(e),
                 "fallback_plan": self._get_fallback_diet_plan(dietary_style, days)
             }
     
+    async def generate_diet_plan_stream(self, user_preferences: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yield diet plan text from Mistral AI as tokens are generated"""
+        payload = self._create_diet_payload(user_preferences)
+        payload["stream"] = True
+        payload["options"] = MODEL_OPTIONS
+        api_url = INFERENCE_API_URL.format(model_name=self.mistral_model)
+        limiter = self._limiter_for(self.mistral_model)
+        
+        for attempt in range(MAX_ATTEMPTS):
+            # The slot is held for the whole stream, since generation runs until it ends
+            ticket = await limiter.acquire()
+            throttled = False
+            try:
+                async with self._sem, self._client.stream(
+                    "POST", api_url, content=orjson.dumps(payload)
+                ) as response:
+                    throttled = response.status_code == 429
+                    if response.status_code in RETRY_STATUS_CODES and attempt < MAX_ATTEMPTS - 1:
+                        await response.aread()
+                        delay = self._retry_delay(response, attempt)
+                    else:
+                        response.raise_for_status()
+                        # Server-Sent Events: one `data: {...}` frame per generated token
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            frame = orjson.loads(line[len("data:"):])
+                            # TGI reports failures mid-stream as an error frame, not an HTTP status
+                            if "error" in frame:
+                                raise RuntimeError(
+                                    f"Hugging Face stream error ({frame.get('error_type', 'unknown')}): {frame['error']}"
+                                )
+                            token = frame.get("token") or {}
+                            if token.get("text") and not token.get("special"):
+                                yield token["text"]
+                        return
+            finally:
+                await limiter.release(ticket, throttled)
+            
+            logger.warning(
+                "Hugging Face API returned %s for %s stream, retrying in %.1fs",
+                response.status_code, self.mistral_model, delay
+            )
+            await asyncio.sleep(delay)
+    
+    async def stream_diet_plan(self, user_preferences: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield {day_key: meals} for each day of the plan as soon as its block is complete"""
+        parser = DietPlanParser()
+        pending = ""
+        
+        async for text in self.generate_diet_plan_stream(user_preferences):
+            pending += text
+            *lines, pending = pending.split('\n')
+            for line in lines:
+                completed_day = parser.feed_line(line)
+                if completed_day:
+                    yield {completed_day: parser.plan[completed_day]}
+        
+        parser.feed_line(pending)
+        completed_day = parser.finish()
+        if completed_day:
+            yield {completed_day: parser.plan[completed_day]}
+    
+    def _create_diet_payload(self, user_preferences: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the Mistral request payload for a set of diet preferences"""
+        
+        # Extract user preferences
+        dietary_style = user_preferences.get('dietary_style', 'vegetarian')
+        calorie_goal = user_preferences.get('calorie_goal', 1800)
+        days = user_preferences.get('days', 7)
+        allergies = user_preferences.get('allergies', [])
+        symptoms = user_preferences.get('symptoms', [])
+        cuisine_preference = user_preferences.get('cuisine', 'mixed')
+        budget = user_preferences.get('budget', 'moderate')
+        
+        # Create detailed prompt for Mistral
+        prompt = self._create_diet_prompt(
+            dietary_style, calorie_goal, days, allergies, symptoms, cuisine_preference, budget
+        )
+        
+        return {
+            "inputs": prompt,
+            "parameters": {
+                "max_new_tokens": 1500,
+                "temperature": 0.7,
+                "do_sample": True,
+                "top_p": 0.9,
+                "return_full_text": False
+            }
+        }
+    
     def _create_diet_prompt(self, dietary_style: str, calorie_goal: int, days: int, 
                            allergies: List[str], symptoms: List[str], cuisine: str, budget: str) -> str:
         """Create detailed prompt for Mistral AI"""
@@ -146,231 +617,119 @@ Begin the meal plan:"""
     def _parse_diet_response(self, generated_text: str, days: int) -> Dict[str, Any]:
         """Parse Mistral's response into structured format"""
         try:
-            lines = generated_text.split('\n')
-            parsed_plan = {}
-            current_day = None
-            current_meal = None
+            parser = DietPlanParser()
+            parser.feed(generated_text)
             
-            for line in lines:
-                line = line.strip()
-                
-                # Check for day headers
-                if line.startswith('DAY '):
-                    current_day = line.replace(':', '').lower().replace(' ', '_')
-                    parsed_plan[current_day] = {}
-                
-                # Check for meal types
-                elif any(meal in line.upper() for meal in ['BREAKFAST:', 'LUNCH:', 'DINNER:', 'SNACK:']):
-                    meal_parts = line.split(':')
-                    if len(meal_parts) >= 2:
-                        meal_type = meal_parts[0].lower()
-                        meal_info = meal_parts[1].strip()
-                        
-                        if current_day:
-                            parsed_plan[current_day][meal_type] = {
-                                'name': meal_info.split(' - ')[0],
-                                'calories': self._extract_calories(meal_info),
-                                'ingredients': [],
-                                'prep_time': ''
-                            }
-                            current_meal = meal_type
-                
-                # Check for ingredients
-                elif line.startswith('Ingredients:') and current_day and current_meal:
-                    ingredients = line.replace('Ingredients:', '').strip()
-                    parsed_plan[current_day][current_meal]['ingredients'] = [
-                        ing.strip() for ing in ingredients.split(',')
-                    ]
-                
-                # Check for prep time
-                elif line.startswith('Prep time:') and current_day and current_meal:
-                    prep_time = line.replace('Prep time:', '').strip()
-                    parsed_plan[current_day][current_meal]['prep_time'] = prep_time
+            return parser.plan
             
-            return parsed_plan
-            
-        except Exception as e:
-            print(f"Error parsing diet response: {e}")
+        except Exception:
+            logger.exception("Error parsing diet response")
             return self._get_fallback_structured_plan(days)
     
-    def _extract_calories(self, text: str) -> int:
-        """Extract calorie information from text"""
-        import re
-        calorie_match = re.search(r'(\d+)\s*cal', text, re.IGNORECASE)
-        return int(calorie_match.group(1)) if calorie_match else 0
-    
     def _generate_grocery_list(self, diet_plan: Dict[str, Any]) -> Dict[str, List[str]]:
         """Generate categorized grocery list from diet plan"""
-        grocery_categories = {
-            'proteins': [],
-            'vegetables': [],
-            'fruits': [],
-            'grains': [],
-            'dairy': [],
-            'pantry': [],
-            'spices': []
-        }
-        
-        # Common PCOS-friendly ingredients categorization
-        protein_keywords = ['chicken', 'fish', 'salmon', 'tuna', 'eggs', 'tofu', 'lentils', 'beans', 'chickpeas', 'quinoa']
-        vegetable_keywords = ['spinach', 'kale', 'broccoli', 'cauliflower', 'bell pepper', 'zucchini', 'cucumber', 'tomato']
-        fruit_keywords = ['berries', 'apple', 'orange', 'avocado', 'lemon', 'lime']
-        grain_keywords = ['oats', 'brown rice', 'quinoa', 'whole wheat']
-        dairy_keywords = ['greek yogurt', 'cottage cheese', 'almond milk', 'coconut milk']
-        pantry_keywords = ['olive oil', 'nuts', 'seeds', 'vinegar', 'honey']
-        
-        all_ingredients = set()
+        # Sets deduplicate ingredients repeated across meals as they are added
+        grocery_categories = defaultdict(set)
         
-        # Extract all ingredients from the diet plan
+        # Extract and categorize all ingredients from the diet plan
         for day_meals in diet_plan.values():
             if isinstance(day_meals, dict):
                 for meal_info in day_meals.values():
                     if isinstance(meal_info, dict) and 'ingredients' in meal_info:
-                        all_ingredients.update(meal_info['ingredients'])
+                        for ingredient in meal_info['ingredients']:
+                            if ingredient.strip():
+                                grocery_categories[_categorize_ingredient(ingredient)].add(ingredient)
         
-        # Categorize ingredients
-        for ingredient in all_ingredients:
-            ingredient_lower = ingredient.lower()
-            categorized = False
-            
-            for keyword in protein_keywords:
-                if keyword in ingredient_lower:
-                    grocery_categories['proteins'].append(ingredient)
-                    categorized = True
-                    break
-            
-            if not categorized:
-                for keyword in vegetable_keywords:
-                    if keyword in ingredient_lower:
-                        grocery_categories['vegetables'].append(ingredient)
-                        categorized = True
-                        break
-            
-            if not categorized:
-                for keyword in fruit_keywords:
-                    if keyword in ingredient_lower:
-                        grocery_categories['fruits'].append(ingredient)
-                        categorized = True
-                        break
-            
-            if not categorized:
-                for keyword in grain_keywords:
-                    if keyword in ingredient_lower:
-                        grocery_categories['grains'].append(ingredient)
-                        categorized = True
-                        break
-            
-            if not categorized:
-                for keyword in dairy_keywords:
-                    if keyword in ingredient_lower:
-                        grocery_categories['dairy'].append(ingredient)
-                        categorized = True
-                        break
-            
-            if not categorized:
-                for keyword in pantry_keywords:
-                    if keyword in ingredient_lower:
-                        grocery_categories['pantry'].append(ingredient)
-                        categorized = True
-                        break
-            
-            if not categorized:
-                grocery_categories['pantry'].append(ingredient)
-        
-        # Remove duplicates and empty categories
-        for category in grocery_categories:
-            grocery_categories[category] = list(set(grocery_categories[category]))
-            grocery_categories[category] = [item for item in grocery_categories[category] if item.strip()]
-        
-        return {k: v for k, v in grocery_categories.items() if v}
+        return {k: sorted(v) for k, v in grocery_categories.items() if v}
     
     def _get_fallback_diet_plan(self, dietary_style: str, days: int) -> Dict[str, Any]:
         """Provide a basic fallback diet plan"""
-        return {
-            "day_1": {
-                "breakfast": {
-                    "name": "PCOS-Friendly Oatmeal Bowl",
-                    "calories": 350,
-                    "ingredients": ["1/2 cup steel-cut oats", "1 tbsp almond butter", "1/4 cup berries", "1 tsp cinnamon"],
-                    "prep_time": "10 minutes"
-                },
-                "lunch": {
-                    "name": "Quinoa Power Salad",
-                    "calories": 450,
-                    "ingredients": ["1/2 cup quinoa", "2 cups spinach", "1/4 cup chickpeas", "1 tbsp olive oil", "lemon juice"],
-                    "prep_time": "15 minutes"
-                },
-                "dinner": {
-                    "name": "Grilled Salmon with Vegetables",
-                    "calories": 500,
-                    "ingredients": ["4 oz salmon", "1 cup broccoli", "1/2 cup sweet potato", "herbs", "olive oil"],
-                    "prep_time": "25 minutes"
-                },
-                "snack": {
-                    "name": "Greek Yogurt with Nuts",
-                    "calories": 200,
-                    "ingredients": ["1/2 cup Greek yogurt", "1 tbsp walnuts", "1 tsp honey"],
-                    "prep_time": "2 minutes"
-                }
-            }
-        }
+        return {"day_1": copy.deepcopy(FALLBACK_DAY_MEALS)}
     
     def _get_fallback_structured_plan(self, days: int) -> Dict[str, Any]:
         """Get structured fallback plan"""
-        base_plan = self._get_fallback_diet_plan("mixed", 1)
-        return {f"day_{i+1}": base_plan["day_1"] for i in range(days)}
+        # Each day gets its own copy so edits to one day don't leak into the others
+        return {f"day_{i+1}": copy.deepcopy(FALLBACK_DAY_MEALS) for i in range(days)}
     
     # Keep all your existing methods for chat functionality
+    def _qa_cache_key(self, question: str, context: str) -> str:
+        """Cache key that ignores case, punctuation and spacing differences in the question"""
+        normalized = " ".join(_QA_WORD_RE.findall(question.casefold()))
+        return hashlib.sha256(f"{normalized}\0{context}".encode()).hexdigest()
+    
     async def answer_question(self, question: str, context: str) -> str:
         """Answer questions using Q&A model"""
-        payload = {
-            "inputs": {
-                "question": question,
-                "context": context
-            }
-        }
+        cache_key = self._qa_cache_key(question, context)
+        cached_answer = self._qa_cache.get(cache_key)
+        if cached_answer is not None:
+            return cached_answer
         
-        result = await self.query_model(self.qa_model, payload)
+        # The Q&A task takes one {question, context} object per request, so questions are not batched
+        result = await self.query_model(self.qa_model, {
+            "inputs": {"question": question, "context": context}
+        })
         
         if "error" in result:
             return "I'm sorry, I couldn't process your question at the moment. Please try again later."
         
         if "answer" in result:
+            self._qa_cache[cache_key] = result["answer"]
             return result["answer"]
         
         return "I couldn't find a specific answer to your question in my knowledge base."
     
+    async def answer_questions(self, questions: List[str], context: str) -> List[Any]:
+        """Answer several questions concurrently (failed items are returned as exceptions)"""
+        return await asyncio.gather(
+            *(self.answer_question(question, context) for question in questions),
+            return_exceptions=True
+        )
+    
     async def generate_response(self, message: str, context: str = "") -> str:
         """Generate conversational response using the context and PCOS knowledge"""
         
-        # Check if it's a PCOS-related question
-        pcos_context = self.get_pcos_context()
+        intents = _message_intents(message)
         
         # If it's a direct question, use Q&A
-        if any(word in message.lower() for word in ["what", "how", "why", "when", "where", "should", "can", "is", "are"]):
-            return await self.answer_question(message, pcos_context)
+        if "question" in intents:
+            return await self.answer_question(message, self.get_pcos_context())
         
         # For general conversation, provide PCOS-focused response
-        return await self.generate_pcos_response(message)
+        return await self.generate_pcos_response(message, intents)
+    
+    async def generate_stream(self, message: str, context: str = "") -> AsyncIterator[str]:
+        """Yield the reply generate_response would return, in chunks as each is available"""
+        intents = _message_intents(message)
+        
+        # The extractive Q&A model returns its answer in one piece
+        if "question" in intents:
+            yield await self.answer_question(message, self.get_pcos_context())
+            return
+        
+        # Canned topic replies are sent a paragraph at a time
+        reply = await self.generate_pcos_response(message, intents)
+        for paragraph in _PARAGRAPH_SPLIT_RE.split(reply):
+            yield paragraph
     
-    async def generate_pcos_response(self, message: str) -> str:
+    async def generate_pcos_response(self, message: str, intents: Optional[frozenset] = None) -> str:
         """Generate PCOS-specific responses"""
-        message_lower = message.lower()
+        if intents is None:
+            intents = _message_intents(message)
         
         # Diet-related responses
-        if any(word in message_lower for word in ["diet", "food", "eat", "meal", "nutrition", "plan"]):
+        if "diet" in intents:
             return self.get_diet_advice()
         
         # Symptom-related responses
-        elif any(word in message_lower for word in ["symptom", "pain", "cramp", "bloating", "period"]):
+        elif "symptom" in intents:
             return self.get_symptom_advice()
         
         # Exercise-related responses
-        elif any(word in message_lower for word in ["exercise", "workout", "gym", "fitness"]):
+        elif "exercise" in intents:
             return self.get_exercise_advice()
         
         # General greeting or support
-        elif any(word in message_lower for word in ["hello", "hi", "help", "support"]):
+        elif "greeting" in intents:
             return "Hello! I'm your PCOS Health Assistant. I can help you with PCOS-friendly diet suggestions, symptom management, exercise recommendations, and answer questions about PCOS. What would you like to know about today?"
         
         # Default response
@@ -379,82 +738,19 @@ Begin the meal plan:"""
     
     def get_pcos_context(self) -> str:
         """Basic PCOS knowledge context"""
-        return """
-        PCOS (Polycystic Ovary Syndrome) is a hormonal disorder affecting women of reproductive age. 
-        
-        Key aspects of PCOS management:
-        
-        Diet: Focus on low glycemic index foods, anti-inflammatory foods, lean proteins, and healthy fats. 
-        Avoid processed foods, sugary drinks, and refined carbohydrates. Good foods include leafy greens, 
-        berries, nuts, fish, lean meats, quinoa, and legumes.
-        
-        Exercise: Regular physical activity helps improve insulin sensitivity. Combination of cardio and 
-        strength training is recommended. Aim for at least 150 minutes of moderate exercise per week.
-        
-        Common symptoms: Irregular periods, weight gain, acne, hair growth, hair loss, mood changes, 
-        insulin resistance, and difficulty losing weight.
-        
-        Lifestyle: Stress management, adequate sleep (7-9 hours), and maintaining a healthy weight 
-        are crucial for managing PCOS symptoms.
-        
-        Supplements: Some women benefit from inositol, vitamin D, omega-3 fatty acids, and chromium, 
-        but consult healthcare providers before starting any supplements.
-        """
+        return PCOS_CONTEXT
     
     def get_diet_advice(self) -> str:
         """Return diet advice for PCOS"""
-        return """For PCOS-friendly nutrition, focus on:
-
-✅ **Include:**
-- Low glycemic index foods (quinoa, sweet potatoes, oats)
-- Anti-inflammatory foods (fatty fish, leafy greens, berries)
-- Lean proteins (chicken, fish, legumes, tofu)
-- Healthy fats (avocado, nuts, olive oil)
-- Fiber-rich foods (vegetables, fruits, whole grains)
-
-❌ **Limit:**
-- Processed and refined foods
-- Sugary drinks and snacks
-- White bread and pasta
-- Fried foods
-- Excessive dairy (some women are sensitive)
-
-💡 **Tip:** Eat balanced meals with protein, healthy fats, and complex carbs to help stabilize blood sugar levels.
-
-Would you like me to create a personalized meal plan for you? Just ask for a "diet plan" and I can generate one based on your preferences!"""
+        return DIET_ADVICE
     
     def get_symptom_advice(self) -> str:
         """Return symptom management advice"""
-        return """Common PCOS symptoms and management tips:
-
-🩸 **Irregular Periods:** Maintain healthy weight, manage stress, consider spearmint tea
-🤰 **Weight Management:** Focus on whole foods, portion control, regular exercise
-😔 **Mood Changes:** Regular exercise, adequate sleep, stress reduction techniques
-💊 **Insulin Resistance:** Low GI diet, regular meals, strength training
-🌿 **Natural Support:** Cinnamon, spearmint tea, and inositol may help
-
-⚠️ **Important:** Always consult your healthcare provider for personalized treatment plans and before making significant changes to your routine."""
+        return SYMPTOM_ADVICE
     
     def get_exercise_advice(self) -> str:
         """Return exercise advice for PCOS"""
-        return """PCOS-friendly exercise recommendations:
-
-🏃‍♀️ **Cardio (3-4x/week):**
-- Brisk walking, swimming, cycling
-- 30-45 minutes moderate intensity
-- Helps with insulin sensitivity
-
-💪 **Strength Training (2-3x/week):**
-- Focus on major muscle groups
-- Improves insulin sensitivity and metabolism
-- Can help with weight management
-
-🧘‍♀️ **Stress-Reducing Activities:**
-- Yoga, pilates, tai chi
-- Helps manage cortisol levels
-- Supports hormonal balance
-
-💡 **Start gradually and listen to your body. Consistency is more important than intensity!**"""
+        return EXERCISE_ADVICE
 
 # Initialize the service
 hf_service = HuggingFaceService()
\ No newline at end of file
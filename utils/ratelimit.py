@@ -0,0 +1,70 @@
+import asyncio
+from typing import NamedTuple
+
+# Successful calls needed before an adaptive limit grows by one
+INCREASE_AFTER = 20
+
+class ProviderProfile(NamedTuple):
+    """Published limits for a model provider"""
+    rpm: int
+    max_concurrent: int
+
+class AdaptiveLimiter:
+    """Token bucket for requests/minute plus an AIMD cap on in-flight calls
+
+    The cap halves at most once per window of in-flight requests: throttles reported
+    by requests acquired before the latest cut are ignored.
+    """
+
+    def __init__(self, profile: ProviderProfile):
+        self.max_limit = profile.max_concurrent
+        self.limit = profile.max_concurrent
+        self._rate = profile.rpm / 60
+        self._tokens = float(profile.max_concurrent)
+        self._updated = None
+        self._in_flight = 0
+        self._successes = 0
+        # Bumped on every cut; requests issued before a cut can't trigger another
+        self._generation = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> int:
+        """Wait for a concurrency slot and a rate token; returns the ticket to pass to release()"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+            ticket = self._generation
+
+        try:
+            delay = self._take_token(asyncio.get_running_loop().time())
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            await self.release(ticket, throttled=False)
+            raise
+        return ticket
+
+    async def release(self, ticket: int, throttled: bool):
+        """Free the slot; halve the limit when throttled, else creep back up"""
+        async with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                # A burst of 429s from requests sent under the old limit counts as one signal
+                if ticket == self._generation:
+                    self.limit = max(1, self.limit // 2)
+                    self._generation += 1
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= INCREASE_AFTER and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def _take_token(self, now: float) -> float:
+        # Refill, then reserve a token; a negative balance means waiting for it
+        if self._updated is not None:
+            self._tokens = min(self.max_limit, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self._rate
@@ -0,0 +1,29 @@
+import logging
+from typing import Any, AsyncIterator, Dict
+from fastapi.responses import StreamingResponse
+import orjson
+
+logger = logging.getLogger(__name__)
+
+def sse_frame(data: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Events `data:` frame"""
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+def event_stream_response(
+    events: AsyncIterator[Dict[str, Any]],
+    done: Dict[str, Any],
+    error_message: str,
+    log_message: str
+) -> StreamingResponse:
+    """Stream events as SSE, then `done`; a failure is logged and sent as a final error frame"""
+
+    async def event_stream():
+        try:
+            async for event in events:
+                yield sse_frame(event)
+            yield sse_frame(done)
+        except Exception:
+            logger.exception(log_message)
+            yield sse_frame({"error": error_message})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")